@@ -1,107 +1,332 @@
 #!/usr/bin/env python
 
+import io
 import os
+import time
 import yaml
 import shutil
 import base64
+import tempfile
 import jinja2
 import requests
 import argparse
+import functools
+import threading
+import concurrent.futures
+from collections import defaultdict
+from email.utils import formatdate
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from lxml import etree
 from termcolor import colored
 
+# use the libyaml bindings when they are available, they are
+# considerably faster than the pure-Python parser and emitter.
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+# fcntl is used to clone files on copy-on-write filesystems, it is
+# not available on Windows.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# HydroShare responses are kept in a persistent http cache when
+# requests-cache is installed.
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
 
 # global vars
 source_dir = "./source"
 gallery_dir = f"./source/gallery"
 template_dir = f"./source/_templates"
 static_dir = f"./source/_static"
+user_agent = "gallery-builder/1.0"
+FICLONE = 0x40049409
+http_cache_name = ".hs_cache"
+http_timeout = (3.05, 10)
+
+# transient HydroShare errors are retried with exponential backoff.
+# GET requests are retried by default, the allowed methods argument
+# isn't used because it was renamed in urllib3 1.26.
+http_retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+hs_cache_ttl = 24 * 60 * 60
+
+# elements and xpath expressions used to read the HydroShare science
+# metadata. The hsterms namespace has changed between HydroShare releases,
+# so creator fields are matched by their local name.
+NSMAP = {
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "dcterms": "http://purl.org/dc/terms/",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+}
+_DC_CREATOR = f'{{{NSMAP["dc"]}}}creator'
+_DC_TITLE = f'{{{NSMAP["dc"]}}}title'
+_DC_SUBJECT = f'{{{NSMAP["dc"]}}}subject'
+_DCTERMS_ABSTRACT = f'{{{NSMAP["dcterms"]}}}abstract'
+_RDF_DESCRIPTION = f'{{{NSMAP["rdf"]}}}Description'
+_XP_CREATOR_FIELDS = etree.XPath("rdf:Description/*", namespaces=NSMAP)
+_CREATOR_FIELDS = frozenset(["name", "organization", "email"])
+
+# newline cleanup applied to descriptions supplied as raw text
+_DESC_TABLE = str.maketrans({"\n": None, "\r": "<br>"})
+
+# templates are compiled the first time they are used and reused for
+# every page rendered afterwards. The compiled bytecode is also cached
+# on disk, keyed on the template source, so later builds skip compiling.
+_JINJA_ENV = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(searchpath="./"),
+    auto_reload=False,
+    bytecode_cache=jinja2.FileSystemBytecodeCache(),
+)
+
+# progress messages are printed from several threads at once, each one
+# is written as a single complete line.
+_print_lock = threading.Lock()
+
+# each worker thread keeps its own requests session so that
+# connections to HydroShare are reused between examples.
+_thread_local = threading.local()
+
+
+def get_session(expire_after=hs_cache_ttl):
+    """
+    returns the requests session for the current thread
+    expire_after: age in seconds after which cached http responses expire,
+                  this is set when the thread's session is created
+    """
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        if requests_cache is not None:
+            session = requests_cache.CachedSession(
+                http_cache_name,
+                expire_after=expire_after,
+                allowable_methods=("GET",),
+            )
+        else:
+            session = requests.Session()
+        session.headers.update({"User-Agent": user_agent})
+        session.mount("https://", HTTPAdapter(max_retries=http_retry))
+        _thread_local.session = session
+    return session
+
+
+def log(message):
+    """
+    prints a progress message on its own line
+    """
+    with _print_lock:
+        print(message)
+
+
+def log_example(example_path, message):
+    """
+    prints a progress message for an example, prefixed with its name
+    example_path: full path to the example directory
+    message: text to print
+    """
+    log(f"   {os.path.basename(example_path)[0:50]}: {message}")
+
+
+@functools.lru_cache(maxsize=None)
+def _label_for(s):
+    """
+    returns a page label for a string, i.e. its base64 encoding
+    """
+    return base64.b64encode(s.encode()).decode()
 
 
 def render_page(template, data, outpath="./index.rst"):
-    Loader = jinja2.FileSystemLoader(searchpath="./")
-    env = jinja2.Environment(loader=Loader)
-    template = env.get_template(template)
+    template = _JINJA_ENV.get_template(template)
 
-    text = template.render(data)
-    with open(outpath, "w") as f:
-        f.write(text)
+    payload = template.render(data).encode("utf-8")
+    with open(outpath, "wb", buffering=0) as f:
+        f.write(payload)
 
 
-def get_metadata_from_hs(hsguid):
+def get_metadata_from_hs(hsguid, cache_dir=None, ttl=hs_cache_ttl):
     """
     This function collects metadata from a hydroshare resource
+    hsguid: hydroshare resource id
+    cache_dir: directory of the .hydroshare.yaml metadata cache, if None
+               the metadata is always collected from hydroshare
+    ttl: age in seconds after which cached metadata is revalidated
     """
-    data = {}
+    # load the cached metadata. It is only used if it was
+    # collected for this resource id.
+    cached = None
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, ".hydroshare.yaml")
+        if os.path.exists(cache_path):
+            cached = read_yaml_cache(cache_path)
+            if not isinstance(cached, dict) or cached.get("id") != hsguid:
+                cached = None
+
+    # reuse the cached metadata if it is recent enough, otherwise
+    # ask hydroshare whether it has changed since it was cached.
+    headers = {}
+    if cached is not None:
+        mtime = os.path.getmtime(cache_path)
+        if time.time() - mtime < ttl:
+            return cached["metadata"]
+        headers["If-Modified-Since"] = formatdate(mtime, usegmt=True)
+
+    # the response is streamed unless it goes through the http cache,
+    # which has to read the full body to store it. Cached responses
+    # expire with the metadata cache so that revalidation isn't
+    # answered from the http cache.
+    stream = requests_cache is None
+
+    data = {"authors": []}
     try:
-        r = requests.get(f"https://hydroshare.org/hsapi/resource/{hsguid}/scimeta")
-        if r.status_code != 200:
+        with get_session(expire_after=ttl).get(
+            f"https://hydroshare.org/hsapi/resource/{hsguid}/scimeta",
+            headers=headers,
+            stream=stream,
+            timeout=http_timeout,
+        ) as r:
+            if r.status_code == 304 and cached is not None:
+                # the resource hasn't changed, restart the cache ttl
+                os.utime(cache_path)
+                return cached["metadata"]
+            if r.status_code != 200:
+                raise Exception
+
+            # parse the response as it is downloaded, only the elements
+            # that are used in the gallery are handed back by lxml.
+            if stream:
+                r.raw.decode_content = True
+                source = r.raw
+            else:
+                source = io.BytesIO(r.content)
+            elements = etree.iterparse(
+                source,
+                events=("end",),
+                tag=[_DC_CREATOR, _DC_TITLE, _DCTERMS_ABSTRACT, _DC_SUBJECT],
+            )
+            for _, elem in elements:
+                if elem.tag == _DC_CREATOR:
+                    d = {}
+                    for val in _XP_CREATOR_FIELDS(elem):
+                        att = etree.QName(val).localname
+                        if att in _CREATOR_FIELDS:
+                            d[att] = val.text
+                        elif att == "description":
+                            # save the user's profile page if it exists
+                            d["hs-profile"] = f"https://hydroshare.org{val.text}"
+
+                    data["authors"].append(d)
+
+                # get the resource title and description
+                elif elem.tag == _DC_TITLE:
+                    data.setdefault("title", elem.text)
+
+                # todo: the encoding of description does not preserve newlines.
+                elif elem.tag == _DCTERMS_ABSTRACT:
+                    data.setdefault(
+                        "hs-description", elem.text.encode("ascii", "ignore").decode()
+                    )
+
+                # get the keywords of the resource, i.e. subjects of the
+                # top-level rdf:Description
+                else:
+                    parent = elem.getparent()
+                    if (
+                        parent.tag == _RDF_DESCRIPTION
+                        and parent.getparent().getparent() is None
+                    ):
+                        data.setdefault("keywords", []).append(elem.text)
+
+                # free the elements that have already been processed
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+        # the title and abstract are required
+        if "title" not in data or "hs-description" not in data:
             raise Exception
 
-        # encode response as bytestring
-        txt = r.text.encode()
-
-        # parse into lxml object
-        root = etree.fromstring(txt)
-        creators = root.findall(".//dc:creator", root.nsmap)
-        data["authors"] = []
-
-        for creator in creators:
-            terms = creator.find("rdf:Description", root.nsmap)
-            d = {}
-            for att in ["name", "organization", "email"]:
-                val = terms.find(f"hsterms:{att}", root.nsmap)
-                if val is not None:
-                    d[att] = val.text
-
-            # save the user's profile page if it exists
-            user_url = terms.find(f"hsterms:description", root.nsmap)
-            if user_url is not None:
-                d["hs-profile"] = f"https://hydroshare.org{user_url.text}"
-
-            data["authors"].append(d)
-
-        # get the resource title and description
-        data["title"] = root.find(".//dc:title", root.nsmap).text
-
-        # todo: the encoding of description does not preserve newlines.
-        data["hs-description"] = (
-            root.find(".//dcterms:abstract", root.nsmap)
-            .text.encode("ascii", "ignore")
-            .decode()
-        )
-
-        # get the keywords
-        subject_kw = root.findall("rdf:Description/dc:subject", root.nsmap)
-        keywords = [kw.text for kw in subject_kw]
-        if len(keywords) > 0:
-            data["keywords"] = keywords
-
     except Exception:
-        print(f"Failed to get hydroshare data for resource id: {hsguid}")
+        log(f"Failed to get hydroshare data for resource id: {hsguid}")
         return None
 
+    if cache_dir is not None:
+        write_yaml_cache(
+            cache_dir, {"id": hsguid, "metadata": data}, filename=".hydroshare.yaml"
+        )
+
     return data
 
 
-def copy_static(data):
+def link_or_copy(src, dst):
+    """
+    places a file at dst with the contents of src, moving as few bytes as
+    possible. The file is hardlinked if possible, otherwise it is cloned
+    on filesystems that support it, e.g. btrfs and XFS, or copied.
+    src: path of the file to copy
+    dst: destination path
+    """
+    # nothing to do if dst is already a link to src
+    if os.path.exists(dst) and os.path.samestat(os.stat(src), os.stat(dst)):
+        return
+
+    # create the file under a unique name next to dst and move it into
+    # place, since neither linking nor cloning replaces an existing file.
+    # Copies are only written through the descriptor of a newly created
+    # file, never by path, so a link to src can't be truncated.
+    tmp_args = dict(prefix=f".{os.path.basename(dst)}.", dir=os.path.dirname(dst))
+    fd, tmp = tempfile.mkstemp(**tmp_args)
+    os.close(fd)
+    os.unlink(tmp)
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            fd, tmp = tempfile.mkstemp(**tmp_args)
+            with os.fdopen(fd, "wb") as fdst, open(src, "rb") as fsrc:
+                try:
+                    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                except (AttributeError, OSError):
+                    shutil.copyfileobj(fsrc, fdst)
+
+            # mkstemp creates the file readable by its owner only
+            shutil.copymode(src, tmp)
+
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def copy_static(data, example_path):
     """
     copy static files to _static directory
+    data: dictionary of data for the example
+    example_path: full path to the example directory
     """
-    print("   copying static files ", end="")
-    if "thumbnail" in data.keys():
+    if "thumbnail" in data:
         # move thumbnail to _static and rename it
-        thumbnail_path = os.path.abspath(os.path.join(subdir, data["thumbnail"]))
+        thumbnail_path = os.path.abspath(os.path.join(example_path, data["thumbnail"]))
         if os.path.exists(thumbnail_path):
             thumbnail_new_name = f'thumbnail-{data["label"]}'
-            shutil.copyfile(thumbnail_path, f"{static_dir}/{thumbnail_new_name}")
+            link_or_copy(thumbnail_path, f"{static_dir}/{thumbnail_new_name}")
             data["thumbnail"] = thumbnail_new_name
-            print(colored("\u2713", "green"))
+            log_example(example_path, "copying static files " + colored("\u2713", "green"))
             return data
 
     # set thumbnail using the default "unknown" image
-    print(colored("\ufffd", "yellow"))
-    print("   " + colored("WARNING: Missing thumbnail, using default image", "yellow"))
+    log_example(
+        example_path,
+        "copying static files "
+        + colored("\ufffd WARNING: Missing thumbnail, using default image", "yellow"),
+    )
     data["thumbnail"] = "missing-thumbnail.png"
 
     return data
@@ -115,35 +340,55 @@ def write_yaml_cache(outdir, data, filename=".cache.yaml"):
     data: dictionary of data to save
     """
 
-    with open(os.path.join(outdir, filename), "w") as f:
-        yaml.dump(data, f)
+    buf = yaml.dump(
+        data, Dumper=SafeDumper, default_flow_style=False, sort_keys=False
+    ).encode("utf-8")
+    with open(os.path.join(outdir, filename), "wb") as f:
+        f.write(buf)
 
 
-def build_example_page(example_path):
+def read_yaml_cache(path):
+    """
+    loads data from a yaml file
+    path: full path to the file
+    returns: dictionary of data
     """
-    creates example landing page from a conf.yaml file
-    example_path: full path to conf.yaml file
+
+    with open(path, "r") as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+
+def load_example_data(example_path, hs_ttl=hs_cache_ttl):
+    """
+    collects the data for an example from its conf.yaml file and HydroShare
+    example_path: full path to the directory containing conf.yaml
+    hs_ttl: age in seconds after which cached HydroShare metadata is revalidated
     returns: dictionary of data for the example or None
     """
-    print(f"\n-- building example {os.path.basename(example_path)[0:50]}...")
+    log_example(example_path, "building example")
     conf = os.path.join(example_path, "conf.yaml")
     with open(conf, "r") as f:
         # load yaml data
-        yaml_data = yaml.load(f, Loader=yaml.FullLoader)
+        yaml_data = yaml.load(f, Loader=SafeLoader)
         hsdata = None
         hsid = yaml_data.get("hydroshare", {}).get("id")
         # collect hydroshare data if a resource id is provided
         # in the yaml file
         if hsid is not None:
             # load data from hydroshare
-            print("   collecting data from HydroShare ", end="")
-            hsdata = get_metadata_from_hs(hsid)
+            hsdata = get_metadata_from_hs(hsid, cache_dir=example_path, ttl=hs_ttl)
             if hsdata is None:
-                print(colored("\u2717", "red"))
-                print("   " + colored("ERROR: something bad happened, skipping", "red"))
+                log_example(
+                    example_path,
+                    "collecting data from HydroShare "
+                    + colored("\u2717 ERROR: something bad happened, skipping", "red"),
+                )
                 # exit early
                 return None
-            print(colored("\u2713", "green"))
+            log_example(
+                example_path,
+                "collecting data from HydroShare " + colored("\u2713", "green"),
+            )
 
         # combine hsdata and yaml data.
         # note, yaml data will overwrite hs data
@@ -151,17 +396,17 @@ def build_example_page(example_path):
         data.update(yaml_data)
 
         # make sure a page label exists in data. If not, create one.
-        if "label" not in data.keys():
+        if "label" not in data:
             try:
                 # set the label as the HS id if it exists
                 data["label"] = data["hydroshare"]["id"]
             except Exception:
                 # set to a base64 encoding of the title
-                data["label"] = base64.b64encode(data["title"].encode()).decode()
+                data["label"] = _label_for(data["title"])
     
         # move text into yaml structure if it's coming directly
         # from HydroShare.
-        if 'description' not in data.keys():
+        if 'description' not in data:
             data['description'] = {'type': 'text',
                                    'value': data['hs-description']}
         # restructure old text format into a dictionary.
@@ -172,11 +417,8 @@ def build_example_page(example_path):
 
         # clean newlines from description if it's supplied as raw text
         if data["description"]["type"] == "text":
-            data["description"]["value"] = data["description"]["value"].replace(
-                "\n", ""
-            )
-            data["description"]["value"] = data["description"]["value"].replace(
-                "\r", "<br>"
+            data["description"]["value"] = data["description"]["value"].translate(
+                _DESC_TABLE
             )
 
         # set the short-title and short-description if they're provided
@@ -201,98 +443,133 @@ def build_example_page(example_path):
                 else data["title"]
             )
 
-        # save the configuration data to a .cache.yaml file
-        # so the site can be re-build without querying metadata
-        # from HydroShare every time.
-        print("   writing cache ", end="")
-        write_yaml_cache(subdir, data, filename=".cache.yaml")
-        print(colored("\u2713", "green"))
-
-        # write the rST page for this example
-
-        print("   creating rST file ", end="")
-        render_page(
-            os.path.join(template_dir, "landingpage.rst"),
-            data,
-            outpath=os.path.join(subdir, "index.rst"),
-        )
-        print(colored("\u2713", "green"))
         return data
 
 
-def build_example_page_cache(example_path):
+def load_example_data_cache(example_path):
     """
-    creates example landing page from a .cache.yaml file
-    example_path: full path to example that will be rendered
+    loads the data for an example from its .cache.yaml file
+    example_path: full path to the directory containing .cache.yaml
     returns: dictionary of data for the example or None
     """
     try:
-        print("\n" + os.path.basename(example_path))
-        print(".. building from cache")
-        cache_conf = os.path.join(example_path, ".cache.yaml")
-        with open(cache_conf, "r") as f:
-            # load yaml data
-            data = yaml.load(f, Loader=yaml.FullLoader)
-
-            # write the rST page for this example
-            render_page(
-                os.path.join(template_dir, "landingpage.rst"),
-                data,
-                outpath=os.path.join(subdir, "index.rst"),
-            )
-
-            return data
+        data = read_yaml_cache(os.path.join(example_path, ".cache.yaml"))
+        log_example(example_path, "building from cache")
+        return data
     except Exception:
-        print(
-            "   "
-            + colored(
-                "ERROR reading cache. I will try building " "without cache", "red"
-            )
+        log_example(
+            example_path,
+            colored("ERROR reading cache. I will try building " "without cache", "red"),
         )
         return None
 
 
-def build_subgallery_pages(conf):
+def collect_example(example_path, use_cache=False, hs_ttl=hs_cache_ttl):
+    """
+    collects the data for a single example, this is where the build waits
+    on HydroShare
+    example_path: full path to the directory containing conf.yaml
+    use_cache: load the data from .cache.yaml if it exists
+    hs_ttl: age in seconds after which cached HydroShare metadata is revalidated
+    returns: dictionary of data for the example or None
+    """
+    # load from cache if requested. If a cache file
+    # isn't found, proceed without cache.
+    data = None
+    if use_cache:
+        data = load_example_data_cache(example_path)
+    if data is None:
+        data = load_example_data(example_path, hs_ttl=hs_ttl)
+    return data
+
+
+def build_example(example_path, data):
+    """
+    writes the cache and landing page for a single example and moves its
+    static files
+    example_path: full path to the directory containing conf.yaml
+    data: dictionary of data for the example
+    returns: dictionary of data for the example
+    """
+    # save the configuration data to a .cache.yaml file
+    # so the site can be re-build without querying metadata
+    # from HydroShare every time.
+    write_yaml_cache(example_path, data, filename=".cache.yaml")
+    log_example(example_path, "writing cache " + colored("\u2713", "green"))
+
+    # write the rST page for this example
+    render_page(
+        os.path.join(template_dir, "landingpage.rst"),
+        data,
+        outpath=os.path.join(example_path, "index.rst"),
+    )
+    log_example(example_path, "creating rST file " + colored("\u2713", "green"))
+
+    # move static data
+    return copy_static(data, example_path)
+
+
+def find_examples(root):
+    """
+    finds example directories, i.e. directories that contain a conf.yaml file
+    root: directory to search recursively
+    returns: generator of example directory paths
+    """
+    with os.scandir(root) as it:
+        entries = list(it)
+
+    if any(e.name == "conf.yaml" and e.is_file() for e in entries):
+        yield root
+
+    for e in entries:
+        if e.is_dir(follow_symlinks=False):
+            yield from find_examples(e.path)
+
+
+def build_subgallery_pages(yaml_data, subgalleries):
     """
     Builds each sub-gallery page, consisting of categories and html
     cards for each example.
+    yaml_data: data loaded from the top-level conf.yaml
+    subgalleries: dictionary of example data by sub-gallery and category
+    returns: dictionary of page labels by sub-gallery path
     """
 
+    # index the galleries defined in the top-level conf by path. The
+    # first gallery defined for a path is used.
+    galleries_by_path = {}
+    for v in yaml_data["galleries"]:
+        galleries_by_path.setdefault(v["gallery_path"], v)
+
+    print("\n.. building sub-gallery pages")
+
     # build the sub-gallery pages
-    with open(conf, "r") as f:
-        yaml_data = yaml.load(f, Loader=yaml.FullLoader)
-
-        print("\n.. building sub-gallery pages")
-
-        # build the sub-gallery pages
-        gallery_labels = {}
-        for sub, sub_data in subgalleries.items():
-            # create a label for the subgallery page
-            # set to a base64 encoding of the title
-            print(f"   processing {sub} ", end="")
-            subname = os.path.basename(sub)
-            id = base64.b64encode(subname.encode()).decode()
-            gallery_labels[sub] = id
-
-            # generate page title. This is necessary for the TOC
-            # get the title from the top-level conf if it exists,
-            # otherwise get it from the directory name
-            title = None
-            for v in yaml_data["galleries"]:
-                if sub == v["gallery_path"]:
-                    title = v["display_name"]
-                    break
-            if title is None:
-                title = f"{os.path.basename(sub)} Gallery"
-
-            render_page(
-                os.path.join(template_dir, "gallery.rst"),
-                {"label": id, "gallery_title": title, "categories": sub_data},
-                outpath=os.path.join(sub, "index.rst"),
-            )
-            print(colored("\u2713", "green"))
+    gallery_labels = {}
+    for sub, sub_data in subgalleries.items():
+        # create a label for the subgallery page
+        # set to a base64 encoding of the title
+        print(f"   processing {sub} ", end="")
+        subname = os.path.basename(sub)
+        id = _label_for(subname)
+        gallery_labels[sub] = id
+
+        # generate page title. This is necessary for the TOC
+        # get the title from the top-level conf if it exists,
+        # otherwise get it from the directory name
+        gallery = galleries_by_path.get(sub)
+        if gallery is not None:
+            title = gallery["display_name"]
+        else:
+            title = f"{subname} Gallery"
+
+        render_page(
+            os.path.join(template_dir, "gallery.rst"),
+            {"label": id, "gallery_title": title, "categories": sub_data},
+            outpath=os.path.join(sub, "index.rst"),
+        )
+        print(colored("\u2713", "green"))
 
-    return yaml_data, gallery_labels
+    return gallery_labels
 
 
 def build_homepage_panels(yaml_data, gallery_labels):
@@ -331,47 +608,80 @@ if __name__ == "__main__":
         default=False,
         help="indicates that cache files should be used if they exist, useful for rebuilding the pages without recollecting metadata from external sources, e.g. HydroShare",
     )
+    p.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=16,
+        help="number of examples to build concurrently, most of the build time is spent waiting on HydroShare",
+    )
+    p.add_argument(
+        "--hs-cache-ttl",
+        type=float,
+        default=hs_cache_ttl / 3600,
+        help="hours before HydroShare metadata saved in .hydroshare.yaml is revalidated, use 0 to always revalidate",
+    )
     args = p.parse_args()
 
+    # load the top-level gallery configuration
+    with open(os.path.join(source_dir, "conf.yaml"), "r") as f:
+        root_conf = yaml.load(f, Loader=SafeLoader)
+
     # loop through each directory in the gallery
     # only process directories that contain conf.yaml files,
     # ignore all other directories
-    subgalleries = {}
-    for subdir, dirs, files in os.walk(args.gallery):
-        if "conf.yaml" in files:
-
-            # build from cache if --cache flag is provided. If a cache file
-            # isn't found, proceed to build without cache.
-            data = None
-            if args.cache:
-                data = build_example_page_cache(subdir)
-            if data is None:
-                data = build_example_page(subdir)
+    example_dirs = list(find_examples(args.gallery))
+
+    # load the templates before starting the thread pools, so that only
+    # one thread reads and writes the bytecode cache.
+    for name in ["landingpage.rst", "gallery.rst", "homepage.rst"]:
+        _JINJA_ENV.get_template(os.path.join(template_dir, name))
+
+    # collect the example data concurrently, most of this time is spent
+    # waiting on HydroShare. Each example is handed to a second pool to be
+    # rendered as soon as its data arrives, so rendering and file output
+    # overlap with the remaining requests.
+    print("\n.. building example pages")
+    subgalleries = defaultdict(lambda: defaultdict(list))
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=args.jobs
+    ) as collect_pool, concurrent.futures.ThreadPoolExecutor(
+        max_workers=os.cpu_count()
+    ) as build_pool:
+        collect_futures = {
+            collect_pool.submit(
+                collect_example, subdir, args.cache, args.hs_cache_ttl * 3600
+            ): subdir
+            for subdir in example_dirs
+        }
+        build_futures = {}
+        for future in concurrent.futures.as_completed(collect_futures):
+            subdir = collect_futures[future]
+            data = future.result()
+            if data is not None:
+                build_futures[subdir] = build_pool.submit(build_example, subdir, data)
+
+        # results are collected in walk order so that the generated
+        # pages are the same for every build.
+        for subdir in example_dirs:
 
             # save the sub-gallery and category if the example was
             # build successfully
-            if data is not None:
-
-                # move static data
-                data = copy_static(data)
+            if subdir in build_futures:
+                data = build_futures[subdir].result()
 
                 # save this metadata for the sub-gallery page too
-                subgallery_path = os.path.dirname(os.path.dirname(subdir))
-                category = os.path.basename(os.path.dirname(subdir))
-
-                # add the sub-gallery to a dictionary if it doesn't already
-                # exist. This dictionary will be used to build the sub-gallery
-                # pages. Do the same for the categories which will be rendered
-                # on the gallery homepage.
-                if subgallery_path not in subgalleries.keys():
-                    subgalleries[subgallery_path] = {}
-                if category not in subgalleries[subgallery_path].keys():
-                    subgalleries[subgallery_path][category] = []
+                category_path = os.path.dirname(subdir)
+                subgallery_path = os.path.dirname(category_path)
+                category = os.path.basename(category_path)
+
+                # add the example to its sub-gallery and category. This
+                # dictionary will be used to build the sub-gallery pages.
+                # The categories will be rendered on the gallery homepage.
                 subgalleries[subgallery_path][category].append(data)
 
     # build the sub-gallery pages
-    subgallery_conf = os.path.join(source_dir, "conf.yaml")
-    yaml_data, gallery_labels = build_subgallery_pages(subgallery_conf)
+    gallery_labels = build_subgallery_pages(root_conf, subgalleries)
 
     # build the homepage panels
-    build_homepage_panels(yaml_data, gallery_labels)
+    build_homepage_panels(root_conf, gallery_labels)